@@ -0,0 +1,219 @@
+import json
+import re
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from click.testing import CliRunner
+
+from webpagecategorizer import categorizer
+
+
+def _engine_combinations():
+    """Installed optional engines (pyahocorasick, google-re2), each also tried as if it was missing."""
+    for ac in dict.fromkeys([categorizer.ahocorasick, None]):
+        for re2 in dict.fromkeys([categorizer.re2, None]):
+            yield ac, re2
+
+
+def _patterns(**patterns_by_category):
+    return {category: [re.compile(p, re.IGNORECASE) for p in patterns]
+            for category, patterns in patterns_by_category.items()}
+
+
+class CategoryMatcherTest(unittest.TestCase):
+    def assertCategories(self, patterns_by_category, expected_by_line):
+        for ac, re2 in _engine_combinations():
+            with self.subTest(ahocorasick=ac is not None, re2=re2 is not None), \
+                    mock.patch.object(categorizer, 'ahocorasick', ac), mock.patch.object(categorizer, 're2', re2):
+                matcher = categorizer.CategoryMatcher(patterns_by_category)
+                actual = {line: matcher.categorize(line) for line in expected_by_line}
+                self.assertEqual(expected_by_line, actual)
+
+    def test_literals_first_category_wins(self):
+        self.assertCategories(_patterns(a=[r"foo\.com"], b=[r"bar\.com"]), {
+            "http://bar.com/?ref=foo.com\n": "a",
+            "http://BAR.com/\n": "b",
+            "http://example.org/\n": None,
+        })
+
+    def test_regex_of_earlier_category_wins_over_literal(self):
+        self.assertCategories(_patterns(a=[r"fo+\.com"], b=[r"bar\.com"]), {
+            "http://foo.com/?ref=bar.com\n": "a",
+            "http://bar.com/?ref=foooo.com\n": "a",
+            "http://bar.com/\n": "b",
+        })
+        # The leftmost regex match belongs to a category after the literal's one
+        self.assertCategories(_patterns(a=[r"fo+\.com"], b=[r"bar\.com"], c=[r"x+\.org"]), {
+            "http://xx.org/?bar.com&foo.com\n": "a",
+            "http://xx.org/?bar.com\n": "b",
+            "http://xx.org/\n": "c",
+        })
+
+    def test_literal_of_earlier_category_wins_over_regex(self):
+        # The backreference keeps the regexes out of the combined regex
+        self.assertCategories(_patterns(a=[r"bar\.com"], b=[r"fo+\.com", r"(x)\1"]), {
+            "http://foo.com/?ref=bar.com\n": "a",
+            "http://foo.com/xx\n": "b",
+            "http://xx.org/\n": "b",
+        })
+
+    def test_first_category_wins_with_and_without_combined_regex(self):
+        lines = {
+            "http://xx.org/?foo.com\n": "a",
+            "http://xx.org/\n": "b",
+        }
+        self.assertCategories(_patterns(a=[r"fo+\.com"], b=[r"x+\.org"]), lines)
+        # A numbered backreference or a group name used twice keeps the patterns out of the combined regex
+        self.assertCategories(_patterns(a=[r"fo+\.com"], b=[r"x+\.org", r"(z)\1"]), lines)
+        self.assertCategories(_patterns(a=[r"(?P<n>fo+)\.com"], b=[r"(?P<n>x+)\.org"]), lines)
+
+    def test_range_with_upper_case_end(self):
+        self.assertCategories(_patterns(a=[r"^x[0-Z]y$"]), {
+            "x_y\n": None,
+            "xAy\n": "a",
+            "xay\n": "a",
+            "x5y\n": "a",
+        })
+
+    def test_line_break_is_matched(self):
+        self.assertCategories(_patterns(a=[r"com\s$"]), {
+            "http://x.com \n": "a",
+            "http://x.com\n": "a",
+            "http://x.com": None,
+        })
+
+    def test_unicode_character_classes(self):
+        # RE2's \w, \d and \b are ASCII-only, Python's are not
+        self.assertCategories(_patterns(hu=[r"^\w+\.hu$"], news=[r"\bnews\b"], num=[r"^\d+$"]), {
+            "élet.hu\n": "hu",
+            "ánews\n": None,
+            "\u0661\u0662\u0663\n": "num",
+        })
+
+    def test_case_sensitive_group(self):
+        self.assertCategories(_patterns(a=[r"(?-i:ABC)\d"], b=[r"X\d+Y"]), {
+            "ABC1\n": "a",
+            "abc1\n": None,
+            "Abc1\n": None,
+            "x12y\n": "b",
+        })
+        self.assertCategories(_patterns(a=[r"(?-i:ABC)"]), {"ABC\n": "a", "abc\n": None})
+
+
+class ScanFilesTest(unittest.TestCase):
+    def test_worker_processes_match_in_process_scan(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            files = []
+            for idx in range(5):
+                file = Path(tmp_dir) / f"links{idx}.txt"
+                file.write_text(f"https://bbc.com/{idx}\nhttps://x.org\nhttps://foooo.com/{idx}\n", encoding='utf-8')
+                files.append(file)
+            category_patterns = _patterns(news=[r"bbc\.com"], tech=[r"fo+\.com"])
+            expected = list(categorizer.scan_files(files, category_patterns, jobs=1))
+            self.assertEqual(expected, list(categorizer.scan_files(files, category_patterns, jobs=2)))
+            self.assertEqual((files[0], [(1, "https://bbc.com/0", "news"), (3, "https://foooo.com/0", "tech")]),
+                             expected[0])
+
+
+class RemoveLinksFromFileActionTest(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.src_file = Path(tmp_dir.name) / "links.txt"
+        self.category_file = Path(tmp_dir.name) / "news.txt"
+
+    def remove(self, content: bytes, *links: str) -> bytes:
+        self.src_file.write_bytes(content)
+        removed_lines = [(idx, link, self.category_file) for idx, link in enumerate(links, 1)]
+        categorizer.RemoveLinksFromFileAction(self.src_file, removed_lines).perform()
+        return self.src_file.read_bytes()
+
+    def test_keeps_other_lines_unchanged(self):
+        self.assertEqual(b"keep\r\nkeep2", self.remove(b"a\r\nkeep\r\nb\nkeep2", "a", "b"))
+        self.assertEqual(b"", self.remove(b"", "a"))
+
+    def test_strips_like_str(self):
+        content = "https://nytimes.com/a\xa0\nhttps://x.org\n".encode()
+        self.assertEqual(b"https://x.org\n", self.remove(content, "https://nytimes.com/a\xa0\n"))
+
+    def test_carriage_return_line_endings(self):
+        self.assertEqual(b"keep\rkeep2\r", self.remove(b"keep\ra\rkeep2\r", "a"))
+
+
+
+class LinkCopyActionsTest(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.src_file = Path(tmp_dir.name) / "links.txt"
+        self.category_file = Path(tmp_dir.name) / "news.txt"
+
+    def copy(self, content: str, *links: str) -> str:
+        self.category_file.write_text(content, encoding='utf-8')
+        with mock.patch.dict(categorizer.LINKS_BY_CATEGORY, clear=True), \
+                mock.patch.object(categorizer, 'UNTERMINATED_CATEGORY_FILES', set()):
+            categorizer.get_links_from_file("news", self.category_file)
+            actions = categorizer.LinkCopyActions()
+            for idx, link in enumerate(links, 1):
+                actions.add("news", self.src_file, idx, link, self.category_file)
+            actions.perform_actions()
+        return self.category_file.read_text(encoding='utf-8')
+
+    def test_appends_links_on_new_lines(self):
+        self.assertEqual("https://a.com\nhttps://b.com\nhttps://c.com\n",
+                         self.copy("https://a.com\n", "https://b.com", "https://c.com"))
+        self.assertEqual("https://a.com\nhttps://b.com\n", self.copy("https://a.com", "https://b.com"))
+        self.assertEqual("https://b.com\n", self.copy("", "https://b.com"))
+
+
+
+class CategorizeWebsitesTest(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        root = Path(tmp_dir.name)
+        self.input_dir = root / "in"
+        self.output_dir = root / "out"
+        self.input_dir.mkdir()
+        self.output_dir.mkdir()
+        self.categories_file = root / "categories.json"
+        self.categories_file.write_text(json.dumps({"news": [r"bbc\.com"], "tech": [r"fo+\.com"]}), encoding='utf-8')
+        (self.output_dir / "news.txt").write_text("https://bbc.com/a\n", encoding='utf-8')
+        (self.input_dir / "a.txt").write_text("https://bbc.com/a\nhttps://foo.com\nhttps://x.org\n", encoding='utf-8')
+        (self.input_dir / "b.txt").write_text("https://foo.com\nhttps://y.org\n", encoding='utf-8')
+        patcher = mock.patch.dict(categorizer.LINKS_BY_CATEGORY, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_cli(self, answers: str):
+        args = ["-i", str(self.input_dir), "-o", str(self.output_dir), "-c", str(self.categories_file),
+                "--remove-moved-lines"]
+        result = CliRunner().invoke(categorizer.categorize_websites, args, input=answers)
+        self.assertEqual(0, result.exit_code, result.output)
+
+    def read(self, directory: Path):
+        return {file.name: file.read_text(encoding='utf-8') for file in sorted(directory.iterdir())}
+
+    def test_confirmed_copy_removes_copied_lines(self):
+        self.run_cli("y\ny\n")
+        # The link in both input files is copied once
+        self.assertEqual({"news.txt": "https://bbc.com/a\n", "tech.txt": "https://foo.com\n"}, self.read(self.output_dir))
+        self.assertEqual({"a.txt": "https://x.org\n", "b.txt": "https://y.org\n"}, self.read(self.input_dir))
+
+    def test_declined_copy_only_removes_already_categorized_lines(self):
+        self.run_cli("n\ny\n")
+        self.assertEqual({"news.txt": "https://bbc.com/a\n"}, self.read(self.output_dir))
+        self.assertEqual({"a.txt": "https://foo.com\nhttps://x.org\n", "b.txt": "https://foo.com\nhttps://y.org\n"},
+                         self.read(self.input_dir))
+
+    def test_link_repeated_in_a_file_is_copied_once(self):
+        (self.input_dir / "b.txt").write_text("https://foo.com\nhttps://y.org\nhttps://foo.com\n", encoding='utf-8')
+        self.run_cli("y\ny\n")
+        self.assertEqual("https://foo.com\n", (self.output_dir / "tech.txt").read_text(encoding='utf-8'))
+        self.assertEqual("https://y.org\n", (self.input_dir / "b.txt").read_text(encoding='utf-8'))
+
+
+if __name__ == '__main__':
+    unittest.main()
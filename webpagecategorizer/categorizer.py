@@ -1,14 +1,53 @@
+import functools
 import json
+import mmap
 import os.path
 import re
+import shutil
+import sys
+import tempfile
 from abc import ABC, abstractmethod
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Set, Iterable
+from typing import IO, Callable, Dict, FrozenSet, Iterator, List, Set, Optional, Pattern, Tuple
 
 import click
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
 LINKS_BY_CATEGORY: Dict[str, Set[str]] = {}
+# Category files whose last line has no line break, links appended to them must start on a new line
+UNTERMINATED_CATEGORY_FILES: Set[Path] = set()
+IO_BUFFER_SIZE = 1 << 20
+CATEGORIZE_CACHE_SIZE = 1 << 17
+# Below this total input size, starting worker processes costs more than scanning the files in-process
+PARALLEL_SCAN_MIN_BYTES = 32 << 20
+_NUMBERED_GROUP_REF = re.compile(r"\\[1-9]|\(\?\(\d")
+# Escapes whose meaning changes when lower-cased (\D -> \d) or that denote a (possibly upper case) character code
+_CASE_DEPENDENT_ESCAPE = re.compile(r"\\[A-Z0-9xu]")
+# Lower-casing a range end changes which characters the range covers, e.g. [0-Z] includes "_" but [0-z] does not
+_UPPER_CASE_RANGE_END = re.compile(r"[A-Z]-|-[A-Z]")
+# Inline flags, e.g. (?i) or the case-sensitive group (?-i:...)
+_INLINE_FLAGS = re.compile(r"\(\?[-aiLmsux]")
+# Syntax that RE2 accepts with a different meaning: its character classes are ASCII-only, it has POSIX classes,
+# and its $ does not match before a trailing line break
+_RE2_DIFFERENT_SYNTAX = re.compile(r"\\[wWdDbBsS]|\[:|\$")
+# Line endings recognized when reading files in text mode (universal newlines)
+_NEWLINE = re.compile(rb"\r\n?|\n")
+# Bytes that bytes.strip() and str.strip() treat differently: non-ASCII whitespace and \x1c-\x1f
+_STRIP_DEPENDS_ON_DECODING = re.compile(rb"[\x1c-\x1f\x80-\xff]")
 
 def load_category_patterns(json_path):
     with open(json_path, 'r', encoding='utf-8') as f:
@@ -19,28 +58,235 @@ def load_category_patterns(json_path):
     for key, patterns in data.items():
         if not isinstance(patterns, list) or not all(isinstance(p, str) for p in patterns):
             raise ValueError(f"Each category must map to a list of regex strings. Problem in category: {key}")
-    return data
-
-def categorize_line(line, patterns_by_category):
-    for category, patterns in patterns_by_category.items():
+    return {key: [re.compile(p, re.IGNORECASE) for p in patterns] for key, patterns in data.items()}
+
+def _as_literal(pattern: str) -> Optional[str]:
+    """Return the plain string a pattern matches if it is just an (escaped) literal, e.g. nytimes\\.com."""
+    chars = []
+    it = iter(pattern)
+    for ch in it:
+        if ch == "\\":
+            ch = next(it, "")
+            # \d, \b, \1 etc. are special, escaped punctuation is a literal character
+            if not ch or ch.isalnum():
+                return None
+        elif ch in ".^$*+?{}[]()|":
+            return None
+        chars.append(ch)
+    return "".join(chars) or None
+
+
+def _lower_case_pattern(pattern: Pattern) -> Pattern:
+    """Compile a case-insensitive pattern as a case-sensitive one for lower-cased text, if that is known to be safe."""
+    source = pattern.pattern
+    if not source.isascii() or _CASE_DEPENDENT_ESCAPE.search(source) or _UPPER_CASE_RANGE_END.search(source):
+        return pattern
+    try:
+        return re.compile(source.lower())
+    except re.error:
+        return pattern
+
+
+def _compile_dispatch(patterns_by_category_idx: Dict[int, List[Pattern]]) -> Callable[[str, int], Optional[int]]:
+    """Generate a function that returns the lowest category index below `below` with a pattern matching the line.
+
+    The patterns are tried one by one in category order, with the loops over categories and patterns unrolled.
+    The search method of each pattern is bound as a default argument, so it is a fast local lookup in the generated code.
+    """
+    namespace = {}
+    params = []
+    body = []
+    for category_idx, patterns in patterns_by_category_idx.items():
+        body.append(f"    if below <= {category_idx}: return None")
         for pattern in patterns:
-            if re.search(pattern, line, re.IGNORECASE):
-                return category
-    return None
+            name = f"_p{len(params)}"
+            namespace[name] = pattern.search
+            params.append(f"{name}={name}")
+            body.append(f"    if {name}(line): return {category_idx}")
+    src = f"def _dispatch(line, below, {', '.join(params)}):\n" + "\n".join(body + ["    return None"])
+    exec(src, namespace)
+    return namespace["_dispatch"]
+
+
+class CategoryMatcher:
+    """Matches lines against all category patterns.
+
+    Literal patterns are matched as plain substrings, with a single Aho-Corasick automaton if pyahocorasick is
+    installed, the remaining patterns are matched with a single combined regex, compiled with RE2 if google-re2 is installed.
+    If patterns of several categories match, the category that comes first in the JSON file wins.
+    """
+
+    def __init__(self, patterns_by_category: Dict[str, List[Pattern]]):
+        self.patterns_by_category = patterns_by_category
+        # Categories are referred to by their index in the JSON file, where several match the first one wins
+        self._categories: List[str] = list(patterns_by_category)
+        self._regex_patterns_by_category_idx: Dict[int, List[Pattern]] = {}
+        # (lower-cased literal, category index), ordered by category index
+        self._literals: List[Tuple[str, int]] = []
+        self._category_idx_by_group: Dict[str, int] = {}
+
+        for category_idx, (category, patterns) in enumerate(patterns_by_category.items()):
+            for pattern in patterns:
+                literal = _as_literal(pattern.pattern)
+                if literal is None:
+                    self._regex_patterns_by_category_idx.setdefault(category_idx, []).append(pattern)
+                else:
+                    self._literals.append((literal.lower(), category_idx))
+        # Lines are lower-cased once, so most patterns can skip case folding. Inline flags may turn case folding off
+        # for a part of a pattern, then the regex patterns have to search the original line.
+        self._regex_on_lower = not any(_INLINE_FLAGS.search(p.pattern)
+                                       for patterns in self._regex_patterns_by_category_idx.values() for p in patterns)
+        if self._regex_on_lower:
+            for patterns in self._regex_patterns_by_category_idx.values():
+                patterns[:] = [_lower_case_pattern(p) for p in patterns]
+        self._automaton = self._build_automaton() if ahocorasick is not None and self._literals else None
+        self._combined = self._compile_combined()
+        # Finds the first matching category if the combined regex could not be compiled, or if it found a later one
+        self._search_each = (_compile_dispatch(self._regex_patterns_by_category_idx)
+                             if self._regex_patterns_by_category_idx else None)
+        # A literal hit of an earlier category than any regex pattern needs no regex search
+        self._first_regex_idx = min(self._regex_patterns_by_category_idx, default=len(self._categories))
+        # The same link often appears many times across input files
+        self._categorize_cached = functools.lru_cache(maxsize=CATEGORIZE_CACHE_SIZE)(self._categorize)
+
+    def _build_automaton(self):
+        automaton = ahocorasick.Automaton()
+        for literal, category_idx in self._literals:
+            # Literals are added in category order, so a literal shared by categories keeps the first one
+            if not automaton.exists(literal):
+                automaton.add_word(literal, category_idx)
+        automaton.make_automaton()
+        return automaton
+
+    def _compile_combined(self):
+        # Category names are not necessarily valid group names, so groups are named by index
+        alternatives = []
+        for category_idx, patterns in self._regex_patterns_by_category_idx.items():
+            if any(_NUMBERED_GROUP_REF.search(p.pattern) for p in patterns):
+                # Group numbers shift inside the combined regex, these patterns can only be searched one by one
+                return None
+            group = f"c{category_idx}"
+            self._category_idx_by_group[group] = category_idx
+            alternatives.append(f"(?P<{group}>{'|'.join(f'(?:{p.pattern})' for p in patterns)})")
+        if not alternatives:
+            return None
+        combined = "|".join(alternatives)
+        ignore_case = any(p.flags & re.IGNORECASE for patterns in self._regex_patterns_by_category_idx.values() for p in patterns)
+        if re2 is not None and not _RE2_DIFFERENT_SYNTAX.search(combined):
+            # RE2 runs in linear time, but lacks e.g. backreferences and lookarounds
+            options = re2.Options()
+            options.case_sensitive = not ignore_case
+            options.log_errors = False
+            try:
+                return re2.compile(combined, options)
+            except re2.error:
+                pass
+        try:
+            return re.compile(combined, re.IGNORECASE if ignore_case else 0)
+        except re.error:
+            # E.g. duplicate group names across patterns
+            return None
+
+    def categorize(self, line) -> Optional[str]:
+        # The line is searched as read, a pattern may match its line break, e.g. com\s$
+        return self._categorize_cached(line)
+
+    def _match_literals(self, lower) -> Optional[int]:
+        """Return the lowest index of the categories with a literal contained in the line."""
+        if self._automaton is not None:
+            return min((category_idx for _, category_idx in self._automaton.iter(lower)), default=None)
+        for literal, category_idx in self._literals:
+            if literal in lower:
+                return category_idx
+        return None
+
+    def _match_regexes(self, line, below: int) -> Optional[int]:
+        """Return the lowest index below `below` of the categories with a regex pattern matching the line."""
+        if self._combined is not None:
+            m = self._combined.search(line)
+            if m is None:
+                return None
+            # The combined regex finds the leftmost match, an earlier category may still match further right
+            hit = self._category_idx_by_group[m.lastgroup]
+            if hit == self._first_regex_idx:
+                return hit if hit < below else None
+            if hit < below:
+                earlier = self._search_each(line, hit)
+                return hit if earlier is None else earlier
+        return self._search_each(line, below)
+
+    def _categorize(self, line) -> Optional[str]:
+        lower = line.lower()
+        category_idx = self._match_literals(lower)
+        if self._search_each is not None and (category_idx is None or category_idx > self._first_regex_idx):
+            # Only regex categories before the literal's one can still win
+            below = len(self._categories) if category_idx is None else category_idx
+            regex_idx = self._match_regexes(lower if self._regex_on_lower else line, below)
+            if regex_idx is not None:
+                category_idx = regex_idx
+        return None if category_idx is None else self._categories[category_idx]
+
+
+def categorize_line(line, matcher: CategoryMatcher):
+    return matcher.categorize(line)
+
+
+# Matcher of a worker process, see _init_worker
+_WORKER_MATCHER: Optional[CategoryMatcher] = None
+
+
+def _init_worker(category_patterns: Dict[str, List[Pattern]]):
+    global _WORKER_MATCHER
+    _WORKER_MATCHER = CategoryMatcher(category_patterns)
+
+
+def _scan_file(file: Path, matcher: Optional[CategoryMatcher] = None) -> List[Tuple[int, str, str]]:
+    """Return (line number, link, category) for every categorized line of the file."""
+    matcher = matcher or _WORKER_MATCHER
+    rows = []
+    with file.open('r', encoding='utf-8', buffering=IO_BUFFER_SIZE) as f:
+        for idx, line in enumerate(f, 1):
+            category = categorize_line(line, matcher)
+            if category:
+                rows.append((idx, line.rstrip('\n'), category))
+    return rows
+
+
+def scan_files(files: List[Path], category_patterns: Dict[str, List[Pattern]], jobs: Optional[int] = None) -> Iterator[Tuple[Path, List[Tuple[int, str, str]]]]:
+    """Yield the categorized lines of each file, in order.
+
+    Several files are scanned in parallel worker processes if jobs is more than 1, or if it is not given and the files
+    are large in total.
+    """
+    if (len(files) <= 1 or jobs == 1
+            or jobs is None and sum(file.stat().st_size for file in files) < PARALLEL_SCAN_MIN_BYTES):
+        matcher = CategoryMatcher(category_patterns)
+        for file in files:
+            yield file, _scan_file(file, matcher)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(category_patterns,)) as executor:
+        yield from zip(files, executor.map(_scan_file, files, chunksize=4))
+
+
+def list_txt_files(dir_path: Path) -> List[Path]:
+    # DirEntry.is_file() usually needs no extra stat() call, unlike Path.glob()
+    with os.scandir(dir_path) as it:
+        return [Path(entry.path) for entry in it if entry.name.endswith('.txt') and entry.is_file()]
 
 
 def get_links_from_file(category, target_file) -> Set[str]:
     if category in LINKS_BY_CATEGORY:
         return LINKS_BY_CATEGORY[category]
 
-    if not os.path.exists(target_file):
-        return set()
-    with target_file.open('r', encoding='utf-8') as f:
-        lines = f.readlines()
-
     s = set()
-    for idx, line in enumerate(lines, 1):
-        s.add(line)
+    if os.path.exists(target_file):
+        with target_file.open('r', encoding='utf-8', buffering=IO_BUFFER_SIZE) as f:
+            line = '\n'
+            for line in f:
+                s.add(line.rstrip('\n'))
+            if not line.endswith('\n'):
+                UNTERMINATED_CATEGORY_FILES.add(target_file)
     LINKS_BY_CATEGORY[category] = s
 
     return s
@@ -60,51 +306,68 @@ class LinkAction(ABC):
 
 @dataclass
 class RemoveLinksFromFileAction(LinkAction):
-    category: str
-    category_file: Path
     src_file_name: Path
-    line_number: int
-    links: Iterable[str] = field(default_factory=set)
+    # (line number, link, category file) of each categorized line
+    removed_lines: List[Tuple[int, str, Path]]
+    links: FrozenSet[str] = field(init=False)
 
-    def perform(self):
-        with self.src_file_name.open('r', encoding='utf-8') as f:
-            lines = f.readlines()
+    def __post_init__(self):
+        # Membership is checked for every line of the source file
+        self.links = frozenset(link.strip() for _, link, _ in self.removed_lines)
 
-        new_lines = []
-        for idx, line in enumerate(lines):
-            stripped = line.strip()
-            if stripped in self.links:
-                continue
-            new_lines.append(line)
-
-        with self.src_file_name.open('w', encoding='utf-8') as f:
-            f.writelines(new_lines)
+    def perform(self):
+        # Compare raw bytes, so the source file does not need to be decoded
+        links = {link.encode('utf-8') for link in self.links}
+
+        # Write kept lines to a temp file next to the source file and swap it in, so the rewrite is atomic
+        tmp = tempfile.NamedTemporaryFile('wb', dir=self.src_file_name.parent, delete=False)
+        try:
+            with tmp, self.src_file_name.open('rb') as f:
+                # Empty files cannot be mapped
+                if os.fstat(f.fileno()).st_size > 0:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        self._write_kept_lines(mm, links, tmp)
+            shutil.copymode(self.src_file_name, tmp.name)
+            os.replace(tmp.name, self.src_file_name)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+
+    def _is_removed_decoded(self, line: bytes) -> bool:
+        # Links were stripped as str, which also strips e.g. a trailing non-breaking space
+        return (_STRIP_DEPENDS_ON_DECODING.search(line) is not None
+                and line.decode('utf-8', errors='surrogateescape').strip() in self.links)
+
+    def _write_kept_lines(self, mm: mmap.mmap, links: Set[bytes], out: IO[bytes]):
+        size = len(mm)
+        # Both are checked once for the whole file, so the common case needs no regex search per line
+        universal_newlines = mm.find(b'\r') != -1
+        may_need_decoding = _STRIP_DEPENDS_ON_DECODING.search(mm) is not None
+        start = 0
+        # Start of the current run of kept lines, written out in one go when a removed line ends it
+        kept_start = 0
+        while start < size:
+            if universal_newlines:
+                newline = _NEWLINE.search(mm, start)
+                end = newline.end() if newline else size
+            else:
+                end = mm.find(b'\n', start) + 1 or size
+            line = mm[start:end]
+            if line.strip() in links or may_need_decoding and self._is_removed_decoded(line):
+                if kept_start < start:
+                    out.write(mm[kept_start:start])
+                kept_start = end
+            start = end
+        if kept_start < size:
+            out.write(mm[kept_start:size])
 
     def describe(self) -> str:
         s = ""
-        for link in self.links:
-            s += f"{self.src_file_name}:{self.line_number} {link.strip()} --> REMOVED (from {self.category_file.name})\n"
+        for line_number, link, category_file in self.removed_lines:
+            s += f"{self.src_file_name}:{line_number} {link.strip()} --> REMOVED (from {category_file.name})\n"
         return s
 
 
-@dataclass
-class LinkCopyAction(LinkAction):
-    category: str
-    src_file_name: Path
-    line_number: int
-    link: str
-    target_file: Path
-
-
-    def perform(self):
-        with self.target_file.open('a', encoding='utf-8') as f:
-            f.write(self.link)
-
-    def describe(self) -> str:
-        return f"{self.src_file_name}:{self.line_number} {self.link.strip()} --> {self.target_file.name}"
-
-
-
 class LinkActions:
     def __init__(self):
         self._actions: List[LinkAction] = []
@@ -115,25 +378,80 @@ class LinkActions:
     def size(self):
         return len(self._actions)
 
-    def _get_actions_by_category(self):
-        d: Dict[str, List[LinkAction]] = {}
-        for a in self._actions:
-            d.setdefault(a.category, []).append(a)
+    def print_actions(self):
+        for action in self._actions:
+            print(action.describe())
+
+    def perform_actions(self):
+        for action in self._actions:
+            action.perform()
+
+
+class LinkCopyActions:
+    """Links to copy into category files.
+
+    Stored column-wise (one list per field) rather than as one object per link, as there is a row for every matched line.
+    Source and target files are stored as indices into a table of distinct paths.
+    """
+
+    def __init__(self):
+        self._categories: List[str] = []
+        self._src_files = array('i')
+        self._line_numbers = array('i')
+        self._links: List[str] = []
+        self._target_files = array('i')
+        self._paths: List[Path] = []
+        self._path_indices: Dict[Path, int] = {}
+
+    def _path_index(self, path: Path) -> int:
+        idx = self._path_indices.get(path)
+        if idx is None:
+            idx = self._path_indices[path] = len(self._paths)
+            self._paths.append(path)
+        return idx
+
+    def add(self, category: str, src_file: Path, line_number: int, link: str, target_file: Path):
+        # Categories coming from worker processes are separate string objects per result chunk
+        self._categories.append(sys.intern(category))
+        self._src_files.append(self._path_index(src_file))
+        self._line_numbers.append(line_number)
+        self._links.append(link)
+        self._target_files.append(self._path_index(target_file))
+
+    def size(self):
+        return len(self._links)
+
+    def _get_rows_by_category(self):
+        d: Dict[str, List[int]] = defaultdict(list)
+        for row, category in enumerate(self._categories):
+            d[category].append(row)
         return d
 
-    def print_actions(self):
-        actions_by_category = self._get_actions_by_category()
+    def _describe(self, row) -> str:
+        src_file = self._paths[self._src_files[row]]
+        target_file = self._paths[self._target_files[row]]
+        return f"{src_file}:{self._line_numbers[row]} {self._links[row].strip()} --> {target_file.name}"
 
-        for category, actions in actions_by_category.items():
-            for action in actions:
-                print(action.describe())
+    def print_actions(self):
+        for category, rows in self._get_rows_by_category().items():
+            for row in rows:
+                print(self._describe(row))
 
     def perform_actions(self):
-        actions_by_category = self._get_actions_by_category()
-
-        for category, actions in actions_by_category.items():
-            for action in actions:
-                action.perform()
+        # Each target file is opened once and kept open until all links are written
+        with ExitStack() as stack:
+            handles: Dict[Path, IO[str]] = {}
+            for rows in self._get_rows_by_category().values():
+                for row in rows:
+                    target_file = self._paths[self._target_files[row]]
+                    f = handles.get(target_file)
+                    if f is None:
+                        f = stack.enter_context(target_file.open('a', encoding='utf-8', buffering=IO_BUFFER_SIZE))
+                        handles[target_file] = f
+                        if target_file in UNTERMINATED_CATEGORY_FILES:
+                            f.write('\n')
+                            UNTERMINATED_CATEGORY_FILES.discard(target_file)
+                    f.write(self._links[row] + '\n')
 
 
 @click.command()
@@ -142,7 +460,8 @@ class LinkActions:
 @click.option('--categories-file', '-c', required=True, type=click.Path(exists=True, dir_okay=False), help='Path to JSON file defining categories and regex patterns.')
 @click.option('--yes', '-y', is_flag=True, help='Auto-confirm all moves (non-interactive).')
 @click.option('--remove-moved-lines', is_flag=True, help='Remove lines from source files based on lines moved into category files.')
-def categorize_websites(input_dir, output_dir, categories_file, yes, remove_moved_lines):
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=None, help='Number of processes to scan input files with. Defaults to the number of CPUs if the input files are larger than 32 MiB in total, otherwise 1.')
+def categorize_websites(input_dir, output_dir, categories_file, yes, remove_moved_lines, jobs):
     """Categorize websites into groups based on regex patterns from a JSON file."""
     input_path = Path(input_dir)
     output_path = Path(output_dir)
@@ -152,62 +471,51 @@ def categorize_websites(input_dir, output_dir, categories_file, yes, remove_move
     category_patterns = load_category_patterns(categories_file)
 
     target_file_by_category = {}
+    new_links_by_category: Dict[str, Set[str]] = defaultdict(set)
+    # Categorized lines of each input file, flagged whether the link was already in its category file
+    categorized_lines_by_file: Dict[Path, List[Tuple[int, str, Path, bool]]] = defaultdict(list)
 
     # Step 1: Categorize lines
-    actions = LinkActions()
-    for file in input_path.glob("*.txt"):
-        with file.open('r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        for idx, line in enumerate(lines, 1):
-            category = categorize_line(line, category_patterns)
-            if category:
-                if category not in target_file_by_category:
-                    target_file_by_category[category] = output_path / f"{category}.txt"
-                target_file = target_file_by_category[category]
-                links = get_links_from_file(category, target_file)
-
-                # Only add to target file if link does not exist
-                if line not in links:
-                    actions.add(LinkCopyAction(category, file, idx, line, target_file))
+    actions = LinkCopyActions()
+    for file, rows in scan_files(list_txt_files(input_path), category_patterns, jobs):
+        for idx, link, category in rows:
+            if category not in target_file_by_category:
+                target_file_by_category[category] = output_path / f"{category}.txt"
+            target_file = target_file_by_category[category]
+            links = get_links_from_file(category, target_file)
+
+            already_categorized = link in links
+            # Only add to target file if link does not exist, and only once
+            new_links = new_links_by_category[category]
+            if not already_categorized and link not in new_links:
+                new_links.add(link)
+                actions.add(category, file, idx, link, target_file)
+            if remove_moved_lines:
+                categorized_lines_by_file[file].append((idx, link, target_file, already_categorized))
 
     actions.print_actions()
+    copied = False
     if actions.size() > 0:
         if yes or click.confirm("Confirm line copy operations?"):
             actions.perform_actions()
-
+            copied = True
 
     # Step 2: Optionally remove moved lines from original files
     if remove_moved_lines:
-        remove_categorized_lines_from_inputs(input_path, output_path, yes)
+        remove_categorized_lines_from_inputs(categorized_lines_by_file, copied, yes)
 
-def remove_categorized_lines_from_inputs(input_path, output_path, yes):
-    """Removes lines from input files that already exist in the category files."""
-    print("\n--- Removing lines from source files that are already in category files ---")
 
-    # Step 1: Collect all categorized lines
-    categorized_lines = set()
-    for cat_file in output_path.glob("*.txt"):
-        with cat_file.open('r', encoding='utf-8') as f:
-            for line in f:
-                categorized_lines.add(line.strip())
+def remove_categorized_lines_from_inputs(categorized_lines_by_file: Dict[Path, List[Tuple[int, str, Path, bool]]], copied: bool, yes):
+    """Removes lines from input files that are in the category files, using the lines categorized in step 1."""
+    print("\n--- Removing lines from source files that are already in category files ---")
 
     actions = LinkActions()
-
-    # Step 2: Remove matching lines from input files
-    for file in input_path.glob("*.txt"):
-        category = os.path.basename(file).replace(".txt", "")
-        with file.open('r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        links = set()
-        for idx, line in enumerate(lines):
-            stripped = line.strip()
-            if stripped in categorized_lines:
-                links.add(stripped)
-
-        if links:
-            actions.add(RemoveLinksFromFileAction(category, cat_file, file, idx, links))
+    for file, categorized_lines in categorized_lines_by_file.items():
+        # Lines that were just copied are only in the category files if the copy was confirmed
+        removed_lines = [(idx, link, target_file) for idx, link, target_file, already_categorized in categorized_lines
+                         if already_categorized or copied]
+        if removed_lines:
+            actions.add(RemoveLinksFromFileAction(file, removed_lines))
 
     actions.print_actions()
     if actions.size() > 0: